@@ -1,8 +1,20 @@
+from functools import partial
+import os
 import streamlit as st
-from functions import create_plotly_table, local_css, percentage_format
+from functions import (
+    bayesian_table_data,
+    create_plotly_table,
+    frequentist_table_data,
+    local_css,
+    percentage_format,
+)
 from fonts import apply_matplotlib_defaults
 from bayesian import Bayesian
 from frequentist import Frequentist
+from store import ResultStore
+from graph import stage
+import offload
+from validation import describe_issues, validate
 
 st.set_page_config(
     page_title="AB Test Calculator",
@@ -13,6 +25,32 @@ local_css("style.css")
 
 apply_matplotlib_defaults()
 
+
+@st.cache_resource
+def get_result_store():
+    # Point RESULTS_DB at a persistent volume in deployments, see the README
+    return ResultStore(os.environ.get("RESULTS_DB", "results.db"))
+
+
+store = get_result_store()
+
+
+def run_z_test(**inputs):
+    return Frequentist(**inputs).z_test()
+
+
+def run_power(**inputs):
+    return Frequentist(**inputs).get_power()
+
+
+def render_probabilities_figure(posterior, **counts):
+    return offload.run(
+        offload.probabilities_figure_task,
+        prob_A=posterior["prob_A"],
+        prob_B=posterior["prob_B"],
+        **counts,
+    )
+
 """
 # AB test calculator
 
@@ -38,10 +76,22 @@ st.sidebar.markdown(
 """
 )
 
+experiment_id = st.sidebar.text_input(
+    "Experiment ID (optional)", help="Results are saved under this ID"
+).strip()
+
 visitors_A = st.sidebar.number_input("Visitors A", value=50000, step=100)
 conversions_A = st.sidebar.number_input("Conversions A", value=1500, step=10)
 visitors_B = st.sidebar.number_input("Visitors B", value=50000, step=100)
 conversions_B = st.sidebar.number_input("Conversions B", value=1560, step=10)
+share_B = st.sidebar.slider(
+    "Intended share of traffic to B",
+    value=0.5,
+    min_value=0.05,
+    max_value=0.95,
+    step=0.05,
+    help="Used to check for a sample ratio mismatch",
+)
 
 st.sidebar.markdown(
     """
@@ -61,29 +111,69 @@ if tails_input == "One-tail":
 else:
     two_tails_bool = True
 
-b = Bayesian(visitors_A, conversions_A, visitors_B, conversions_B)
+checks = validate(
+    visitors_A, conversions_A, visitors_B, conversions_B, expected_share_B=share_B
+)
+
+if checks["invalid"][0] or checks["degenerate"][0]:
+    t = """
+    <img class='error'
+        src='https://www.flaticon.com/svg/static/icons/svg/595/595067.svg'>
+    """
+    st.markdown(t, unsafe_allow_html=True)
+
+    for issue in describe_issues(checks):
+        st.markdown(issue)
+
+    st.stop()
+
+for issue in describe_issues(checks):
+    st.warning(issue)
+
+# Each stage is only recomputed when its inputs change, see graph.stage
+counts = dict(
+    visitors_A=visitors_A,
+    conversions_A=conversions_A,
+    visitors_B=visitors_B,
+    conversions_B=conversions_B,
+)
 
 # Bayesian Method
 if method == "Bayesian":
 
     try:
-        b.generate_posterior_samples()
-        b.calculate_probabilities()
-        b.plot_bayesian_probabilities()
+        b = Bayesian(**counts)
+
+        posterior = stage(
+            "posterior",
+            partial(offload.run, offload.posterior_task),
+            counts,
+        )
+        prob_A = posterior["prob_A"]
+        prob_B = posterior["prob_B"]
+
+        probabilities_figure = stage(
+            "probabilities_figure",
+            render_probabilities_figure,
+            counts,
+            depends_on=("posterior",),
+        )
+        st.image(probabilities_figure)
 
         st.text("")
 
-        bayesian_data = {
-            "<b>Variant</b>": ["A", "B"],
-            "<b>Visitors</b>": [f"{b.visitors_A:,}", f"{b.visitors_B:,}"],
-            "<b>Conversions</b>": [b.conversions_A, b.conversions_B],
-            "<b>Conversion rate</b>": [f"{b.control_cr:.2%}", f"{b.variant_cr:.2%}"],
-            "<b>Uplift</b>": ["", f"{b.relative_difference:.2%}"],
-            "<b>Likelihood of being better</b>": [f"{b.prob_A:.2%}", f"{b.prob_B:.2%}"],
-        }
+        bayesian_data = bayesian_table_data(b, prob_A, prob_B)
 
         create_plotly_table(bayesian_data)
 
+        if experiment_id:
+            store.record(
+                experiment_id,
+                method,
+                inputs=counts,
+                results=dict(prob_A=prob_A, prob_B=prob_B),
+            )
+
         """
         The below graph plots the simulated difference between the two
         posterior distributions for the variants. It highlights the potential
@@ -93,7 +183,7 @@ if method == "Bayesian":
 
         st.text("")
 
-        b.plot_simulation_of_difference()
+        st.image(posterior["difference_figure"])
 
         """
         ---
@@ -118,18 +208,15 @@ if method == "Bayesian":
 
 else:  # Frequentist
 
-    f = Frequentist(
-        visitors_A,
-        conversions_A,
-        visitors_B,
-        conversions_B,
-        alpha=alpha_input,
-        two_tails=two_tails_bool,
-    )
+    frequentist_inputs = dict(counts, alpha=alpha_input, two_tails=two_tails_bool)
 
-    z_score, p_value = f.z_test()
+    f = Frequentist(**frequentist_inputs)
 
-    power = f.get_power()
+    z_score, p_value = stage(
+        "z_test", run_z_test, dict(counts, two_tails=two_tails_bool)
+    )
+
+    power = stage("power", run_power, frequentist_inputs)
 
     if p_value < alpha_input:
         t = """
@@ -182,19 +269,18 @@ else:  # Frequentist
         or conclude the test as inconclusive.
         """
 
-    frequentist_data = {
-        "<b>Variant</b>": ["A", "B"],
-        "<b>Visitors</b>": [f"{f.visitors_A:,}", f"{f.visitors_B:,}"],
-        "<b>Conversions</b>": [f.conversions_A, f.conversions_B],
-        "<b>Conversion rate</b>": [f"{f.control_cr:.2%}", f"{f.variant_cr:.2%}"],
-        "<b>Uplift</b>": ["", f"{f.relative_difference:.2%}"],
-        "<b>Power</b>": ["", f"{power:.4f}"],
-        "<b>Z-score</b>": ["", f"{z_score:.4f}"],
-        "<b>P-value</b>": ["", f"{p_value:.4f}"],
-    }
+    frequentist_data = frequentist_table_data(f, z_score, p_value, power)
 
     create_plotly_table(frequentist_data)
 
+    if experiment_id:
+        store.record(
+            experiment_id,
+            method,
+            inputs=frequentist_inputs,
+            results=dict(z_score=z_score, p_value=p_value, power=power),
+        )
+
     z = f.get_z_value()
 
     """
@@ -203,7 +289,12 @@ else:  # Frequentist
     we would expect under the null hypothesis.
     """
 
-    f.plot_test_visualisation()
+    test_figure = stage(
+        "test_figure",
+        partial(offload.run, offload.test_figure_task),
+        frequentist_inputs,
+    )
+    st.image(test_figure)
 
     if p_value < alpha_input:
         f"""
@@ -237,13 +328,47 @@ else:  # Frequentist
     type II error.
     """
 
-    f.plot_power()
+    power_figure = stage(
+        "power_figure",
+        partial(offload.run, offload.power_figure_task),
+        frequentist_inputs,
+    )
+    st.image(power_figure)
 
     """
     ---
 
     """
 
+if experiment_id:
+    history = store.history(experiment_id, method)
+
+    if history:
+        f"""
+        #### History of {experiment_id}
+
+        Results saved for this experiment each time the test data changed.
+        """
+
+        if method == "Bayesian":
+            metrics = ["prob_A", "prob_B"]
+        else:
+            metrics = ["p_value", "power"]
+
+        st.line_chart(
+            {
+                "Recorded": [row["recorded_at"] for row in history],
+                **{metric: [row[metric] for row in history] for metric in metrics},
+            },
+            x="Recorded",
+        )
+        st.dataframe(history, hide_index=True)
+
+        """
+        ---
+
+        """
+
 """
 
 #### See also
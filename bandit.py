@@ -0,0 +1,200 @@
+"""
+Thompson sampling traffic allocation between the arms of a test.
+
+Allocates on the Beta posteriors used by `Bayesian`, with an offline replay
+to compare it against a fixed split.
+
+    python bandit.py --rates 0.030 0.031 0.033 --visitors 100000
+"""
+
+import argparse
+
+import numpy as np
+
+from batch import ALPHA_PRIOR, BETA_PRIOR
+
+
+def thompson_assign(visitors, conversions, n, rng=None):
+    """Assigns the next n visitors to arms by Thompson sampling.
+
+    Each visitor goes to the arm with the highest draw from its Beta
+    posterior. Leading dimensions of the counts are treated as independent
+    tests, so many tests can be allocated in one call.
+
+    Parameters
+    ----------
+    visitors, conversions : array_like
+        Running counts for each arm, arms on the last axis
+    n : int
+        Number of visitors to assign
+    rng : numpy.random.Generator (optional)
+        Source of randomness (default = a new default_rng())
+
+    Returns
+    -------
+    assigned : numpy.ndarray
+        Number of the visitors assigned to each arm, the same shape as the
+        counts
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    visitors = np.asarray(visitors)
+    conversions = np.asarray(conversions)
+    arms = visitors.shape[-1]
+
+    a = ALPHA_PRIOR + conversions[..., None, :]
+    b = BETA_PRIOR + (visitors - conversions)[..., None, :]
+    samples = rng.beta(a, b, size=visitors.shape[:-1] + (n, arms))
+    tests = int(np.prod(visitors.shape[:-1]))
+    chosen = samples.argmax(axis=-1).reshape(tests, n)
+
+    # Offset each test's arm indices so one bincount counts all tests at once
+    chosen += arms * np.arange(tests)[:, None]
+    assigned = np.bincount(chosen.ravel(), minlength=tests * arms)
+
+    return assigned.reshape(visitors.shape)
+
+
+def thompson_allocation(visitors, conversions, draws=1000, rng=None):
+    """Returns the share of traffic to send to each arm.
+
+    The shares are the estimated probabilities of each arm being the best,
+    from `draws` samples of the posteriors.
+    """
+
+    return thompson_assign(visitors, conversions, draws, rng) / draws
+
+
+class ThompsonSampler(object):
+    """
+    A class used to allocate the traffic of a running test between N arms
+
+    ...
+
+    Attributes
+    ---------
+    visitors, conversions : numpy.ndarray
+        The running counts for each arm
+
+    Methods
+    -------
+    update
+        Adds the results of a batch of visitors
+    assign
+        Assigns the next batch of visitors to arms
+    allocation
+        Returns the share of traffic to send to each arm
+    """
+
+    def __init__(self, arms, seed=None):
+        self.visitors = np.zeros(arms, dtype=np.int64)
+        self.conversions = np.zeros(arms, dtype=np.int64)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, visitors, conversions):
+        """Adds the visitors and conversions of a batch for each arm."""
+
+        self.visitors += visitors
+        self.conversions += conversions
+
+    def assign(self, n):
+        """Returns how many of the next n visitors to send to each arm."""
+
+        return thompson_assign(self.visitors, self.conversions, n, self._rng)
+
+    def allocation(self, draws=1000):
+        """Returns the share of traffic to send to each arm."""
+
+        return thompson_allocation(self.visitors, self.conversions, draws, self._rng)
+
+
+def replay(
+    true_rates, visitors, policy="thompson", batch_size=100, runs=100, seed=None
+):
+    """Replays tests offline with known conversion rates.
+
+    Parameters
+    ----------
+    true_rates : array_like
+        The true conversion rate of each arm
+    visitors : int
+        Total visitors in each test
+    policy : str (optional)
+        "thompson" to allocate each batch by Thompson sampling or "fixed" for
+        an even random split (default = "thompson")
+    batch_size : int (optional)
+        Visitors allocated between updates of the counts (default = 100)
+    runs : int (optional)
+        Number of tests replayed, simulated side by side (default = 100)
+    seed : int (optional)
+        Seed for reproducible results
+
+    Returns
+    -------
+    report : dict
+        The mean conversions, the mean regret (conversions lost against
+        always showing the best arm) and the mean share of traffic of each arm
+    """
+
+    if policy not in ("thompson", "fixed"):
+        raise ValueError(f"unknown policy {policy!r}")
+
+    rng = np.random.default_rng(seed)
+    true_rates = np.asarray(true_rates, dtype=float)
+    arms = true_rates.size
+
+    counts_visitors = np.zeros((runs, arms), dtype=np.int64)
+    counts_conversions = np.zeros((runs, arms), dtype=np.int64)
+    even_split = np.full(arms, 1 / arms)
+
+    for start in range(0, visitors, batch_size):
+        n = min(batch_size, visitors - start)
+        if policy == "thompson":
+            assigned = thompson_assign(counts_visitors, counts_conversions, n, rng)
+        else:
+            assigned = rng.multinomial(n, even_split, size=runs)
+
+        counts_conversions += rng.binomial(assigned, true_rates)
+        counts_visitors += assigned
+
+    regret = (counts_visitors * (true_rates.max() - true_rates)).sum(axis=1)
+
+    return {
+        "policy": policy,
+        "conversions": counts_conversions.sum(axis=1).mean(),
+        "regret": regret.mean(),
+        "traffic_share": (counts_visitors / visitors).mean(axis=0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.03, 0.033])
+    parser.add_argument("--visitors", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'Policy':<12}{'Conversions':>14}{'Regret':>10}  Traffic share")
+    for policy in ["fixed", "thompson"]:
+        report = replay(
+            args.rates,
+            args.visitors,
+            policy=policy,
+            batch_size=args.batch_size,
+            runs=args.runs,
+            seed=args.seed,
+        )
+        shares = " ".join(f"{share:.1%}" for share in report["traffic_share"])
+        print(
+            f"{policy:<12}"
+            f"{report['conversions']:>14,.1f}"
+            f"{report['regret']:>10,.1f}  {shares}"
+        )
+
+
+if __name__ == "__main__":
+    main()
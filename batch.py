@@ -0,0 +1,195 @@
+import numpy as np
+from scipy.special import betaln, log_ndtr, logsumexp, ndtr, ndtri
+
+ALPHA_PRIOR = 1
+BETA_PRIOR = 1
+
+
+def z_test(visitors_A, conversions_A, visitors_B, conversions_B, two_tails=True):
+    """Vectorised version of `Frequentist.z_test` over arrays of experiments.
+
+    One-tail tests take their direction from the sign of the observed
+    difference, as `Frequentist` does.
+
+    Returns
+    -------
+    z_score : numpy.ndarray
+        Number of standard deviations between the mean of the control
+        conversion rate distribution and the variant conversion rate
+    p_value : numpy.ndarray
+        Probability of obtaining test results at least as extreme as the
+        observed results, under the conditions of the null hypothesis
+    """
+
+    visitors_A = np.asarray(visitors_A, dtype=float)
+    visitors_B = np.asarray(visitors_B, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        control_cr = conversions_A / visitors_A
+        variant_cr = conversions_B / visitors_B
+        combined_cr = (conversions_A + conversions_B) / (visitors_A + visitors_B)
+        combined_se = np.sqrt(
+            combined_cr * (1 - combined_cr) * (1 / visitors_A + 1 / visitors_B)
+        )
+        z_score = (variant_cr - control_cr) / combined_se
+
+    if two_tails:
+        p_value = 2 * ndtr(-np.abs(z_score))
+    else:
+        p_value = ndtr(-np.abs(z_score))
+
+    return z_score, p_value
+
+
+def log_p_value(z_score, two_tails=True):
+    """Natural log of the p-value of `z_test` computed from the Z-score.
+
+    Stays accurate far into the tails, where the p-value itself underflows
+    to 0 beyond a Z-score of about 38.
+    """
+
+    log_p = log_ndtr(-np.abs(z_score))
+    if two_tails:
+        log_p = log_p + np.log(2)
+
+    return log_p
+
+
+def power(
+    visitors_A, conversions_A, visitors_B, conversions_B, alpha=0.05, two_tails=True
+):
+    """Vectorised version of `Frequentist.get_power`, the observed power."""
+
+    n = np.asarray(visitors_A, dtype=float) + visitors_B
+
+    if two_tails:
+        qu = ndtri(1 - alpha / 2)
+    else:
+        qu = ndtri(1 - alpha)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        control_cr = conversions_A / np.asarray(visitors_A, dtype=float)
+        variant_cr = conversions_B / np.asarray(visitors_B, dtype=float)
+
+        diff = np.abs(variant_cr - control_cr)
+        avg_cr = (control_cr + variant_cr) / 2
+
+        control_var = control_cr * (1 - control_cr)
+        variant_var = variant_cr * (1 - variant_cr)
+        avg_var = avg_cr * (1 - avg_cr)
+
+        sd = np.sqrt(control_var + variant_var)
+        power_lower = ndtr((np.sqrt(n) * diff - qu * np.sqrt(2 * avg_var)) / sd)
+        power_upper = 1 - ndtr((np.sqrt(n) * diff + qu * np.sqrt(2 * avg_var)) / sd)
+
+    return power_lower + power_upper
+
+
+def prob_b_beats_a(visitors_A, conversions_A, visitors_B, conversions_B):
+    """Vectorised likelihood of B being better than A.
+
+    Uses the same Beta posteriors as `Bayesian`, with each posterior
+    approximated by a normal distribution so that no sampling is needed. The
+    approximation is close for the sample sizes AB tests are run at.
+    """
+
+    alpha_A = ALPHA_PRIOR + np.asarray(conversions_A, dtype=float)
+    beta_A = BETA_PRIOR + np.asarray(visitors_A, dtype=float) - conversions_A
+    alpha_B = ALPHA_PRIOR + np.asarray(conversions_B, dtype=float)
+    beta_B = BETA_PRIOR + np.asarray(visitors_B, dtype=float) - conversions_B
+
+    mean_A, var_A = _beta_moments(alpha_A, beta_A)
+    mean_B, var_B = _beta_moments(alpha_B, beta_B)
+
+    return ndtr((mean_B - mean_A) / np.sqrt(var_A + var_B))
+
+
+def log_prob_b_beats_a(visitors_A, conversions_A, visitors_B, conversions_B):
+    """Natural logs of the exact likelihoods of A and of B being better.
+
+    Integrates the Beta posteriors of `Bayesian` with the closed form sum
+
+        P(B > A) = sum over i < alpha_B of
+            B(alpha_A + i, beta_A + beta_B)
+            / ((beta_B + i) B(1 + i, beta_B) B(alpha_A, beta_A))
+
+    evaluated with log-beta functions and logsumexp, so that probabilities far
+    below what sampling can resolve are still accurate. The cost grows with
+    the number of conversions. Arrays are evaluated one experiment at a time.
+
+    Returns
+    -------
+    log_prob_A, log_prob_B : numpy.ndarray
+        The natural logs of the likelihoods of A and of B being better
+    """
+
+    visitors_A, conversions_A, visitors_B, conversions_B = np.broadcast_arrays(
+        visitors_A, conversions_A, visitors_B, conversions_B
+    )
+    log_prob_A = np.empty(visitors_A.shape)
+    log_prob_B = np.empty(visitors_A.shape)
+
+    for i in np.ndindex(visitors_A.shape):
+        alpha_A = ALPHA_PRIOR + conversions_A[i]
+        beta_A = BETA_PRIOR + visitors_A[i] - conversions_A[i]
+        alpha_B = ALPHA_PRIOR + conversions_B[i]
+        beta_B = BETA_PRIOR + visitors_B[i] - conversions_B[i]
+
+        log_prob_A[i] = _log_prob_beats(alpha_B, beta_B, alpha_A, beta_A)
+        log_prob_B[i] = _log_prob_beats(alpha_A, beta_A, alpha_B, beta_B)
+
+    return log_prob_A, log_prob_B
+
+
+def benjamini_hochberg(log_p_values, q=0.05):
+    """Benjamini-Hochberg false discovery rate control on log p-values.
+
+    Parameters
+    ----------
+    log_p_values : array_like
+        Natural logs of the p-values of the tests, e.g. from `log_p_value`
+    q : float (optional)
+        The false discovery rate to control (default = 0.05)
+
+    Returns
+    -------
+    discoveries : numpy.ndarray
+        Boolean array flagging the tests that are significant
+    log_q_values : numpy.ndarray
+        Natural logs of the adjusted p-values (q-values)
+    """
+
+    log_p_values = np.asarray(log_p_values, dtype=float)
+    m = log_p_values.size
+    order = np.argsort(log_p_values)
+    rank = np.arange(1, m + 1)
+
+    # q-value of the k-th smallest p-value is min over j >= k of p_j * m / j
+    adjusted = log_p_values[order] + np.log(m) - np.log(rank)
+    adjusted = np.minimum.accumulate(adjusted[::-1])[::-1]
+
+    log_q_values = np.empty(m)
+    log_q_values[order] = np.minimum(adjusted, 0)
+
+    return log_q_values <= np.log(q), log_q_values
+
+
+def _log_prob_beats(alpha_1, beta_1, alpha_2, beta_2):
+    """Natural log of P(X2 > X1) for X1 ~ Beta(alpha_1, beta_1) and
+    X2 ~ Beta(alpha_2, beta_2), with alpha_2 a whole number."""
+
+    i = np.arange(int(alpha_2))
+    terms = (
+        betaln(alpha_1 + i, beta_1 + beta_2)
+        - np.log(beta_2 + i)
+        - betaln(1 + i, beta_2)
+        - betaln(alpha_1, beta_1)
+    )
+
+    # Rounding across many terms can push the sum slightly above 1
+    return min(logsumexp(terms), 0.0)
+
+
+def _beta_moments(a, b):
+    total = a + b
+    return a / total, a * b / (total ** 2 * (total + 1))
@@ -1,8 +1,10 @@
+import numpy as np
 import matplotlib.pyplot as plt
 import scipy.stats as scs
 import matplotlib.ticker as mtick
 import seaborn as sns
 import streamlit as st
+from batch import ALPHA_PRIOR, BETA_PRIOR, log_prob_b_beats_a
 from functions import round_decimals_down
 from fonts import FONT_DEFAULT, FONT_TITLE
 
@@ -24,6 +26,13 @@ class Bayesian(object):
         B as the variant
     relative_difference : float
         The percentage difference between A and B
+    low_memory : bool (optional)
+        Store the posterior samples as float32 and release them once the
+        probabilities have been calculated and the difference plotted.
+        Calling either again then needs new samples (default = False)
+    difference : numpy.ndarray
+        The simulated relative difference between B and A. In low memory mode
+        this reuses the buffer of the B samples
 
     Methods
     -------
@@ -31,6 +40,11 @@ class Bayesian(object):
         Creates samples for the posterior distributions for A and B
     calculate_probabilities
         Calculate the likelihood that the variants are better
+    calculate_difference
+        Calculates the relative difference between the posterior samples
+    calculate_log_probabilities
+        Calculates the natural logs of the likelihoods exactly, without
+        sampling
     plot_bayesian_probabilities
         Plots a horizontal bar chart of the likelihood of either variant being
         the winner
@@ -41,7 +55,27 @@ class Bayesian(object):
 
     """
 
-    def __init__(self, visitors_A, conversions_A, visitors_B, conversions_B):
+    __slots__ = (
+        "visitors_A",
+        "conversions_A",
+        "visitors_B",
+        "conversions_B",
+        "control_cr",
+        "variant_cr",
+        "relative_difference",
+        "low_memory",
+        "samples_posterior_A",
+        "samples_posterior_B",
+        "difference",
+        "prob_A",
+        "prob_B",
+        "log_prob_A",
+        "log_prob_B",
+    )
+
+    def __init__(
+        self, visitors_A, conversions_A, visitors_B, conversions_B, low_memory=False
+    ):
         self.visitors_A = visitors_A
         self.conversions_A = conversions_A
         self.visitors_B = visitors_B
@@ -49,37 +83,96 @@ class Bayesian(object):
         self.control_cr = conversions_A / visitors_A
         self.variant_cr = conversions_B / visitors_B
         self.relative_difference = self.variant_cr / self.control_cr - 1
+        self.low_memory = low_memory
+        self.samples_posterior_A = None
+        self.samples_posterior_B = None
+        self.difference = None
 
     def generate_posterior_samples(self):
         """Creates samples for the posterior distributions for A and B"""
 
-        alpha_prior = 1
-        beta_prior = 1
-
         posterior_A = scs.beta(
-            alpha_prior + self.conversions_A,
-            beta_prior + self.visitors_A - self.conversions_A,
+            ALPHA_PRIOR + self.conversions_A,
+            BETA_PRIOR + self.visitors_A - self.conversions_A,
         )
 
         posterior_B = scs.beta(
-            alpha_prior + self.conversions_B,
-            beta_prior + self.visitors_B - self.conversions_B,
+            ALPHA_PRIOR + self.conversions_B,
+            BETA_PRIOR + self.visitors_B - self.conversions_B,
         )
 
         samples = 50000
-        self.samples_posterior_A = posterior_A.rvs(samples)
-        self.samples_posterior_B = posterior_B.rvs(samples)
+
+        if self.low_memory:
+            # Draw in chunks straight into float32 buffers so the full float64
+            # arrays are never held at once
+            chunk_size = 10000
+            self.samples_posterior_A = np.empty(samples, dtype=np.float32)
+            self.samples_posterior_B = np.empty(samples, dtype=np.float32)
+            for start in range(0, samples, chunk_size):
+                stop = min(start + chunk_size, samples)
+                self.samples_posterior_A[start:stop] = posterior_A.rvs(stop - start)
+                self.samples_posterior_B[start:stop] = posterior_B.rvs(stop - start)
+        else:
+            self.samples_posterior_A = posterior_A.rvs(samples)
+            self.samples_posterior_B = posterior_B.rvs(samples)
+
+        self.difference = None
 
     def calculate_probabilities(self):
         """Calculate the likelihood that the variants are better"""
 
+        self._check_samples()
         self.prob_A = (self.samples_posterior_A > self.samples_posterior_B).mean()
-        self.prob_B = (self.samples_posterior_A <= self.samples_posterior_B).mean()
+        self.prob_B = 1 - self.prob_A
 
-    def plot_bayesian_probabilities(self, labels=["A", "B"]):
+        if self.low_memory:
+            # Overwrite the B samples with the relative difference and drop
+            # both sample arrays, only the difference is needed from here on
+            self.difference = self.calculate_difference(out=self.samples_posterior_B)
+            self.samples_posterior_A = None
+            self.samples_posterior_B = None
+
+    def calculate_log_probabilities(self):
+        """
+        Calculates the natural logs of the likelihoods that the variants are
+        better by integrating the posteriors exactly. Unlike the sampled
+        probabilities these resolve results far beyond 1 in the number of
+        samples
+        """
+
+        log_prob_A, log_prob_B = log_prob_b_beats_a(
+            self.visitors_A, self.conversions_A, self.visitors_B, self.conversions_B
+        )
+        self.log_prob_A = float(log_prob_A)
+        self.log_prob_B = float(log_prob_B)
+
+    def calculate_difference(self, out=None):
+        """
+        Calculates the relative difference between the posterior samples of B
+        and A, writing into `out` when a preallocated buffer is given
+        """
+
+        self._check_samples()
+        difference = np.divide(
+            self.samples_posterior_B, self.samples_posterior_A, out=out
+        )
+        np.subtract(difference, 1, out=difference)
+
+        return difference
+
+    def _check_samples(self):
+        if self.samples_posterior_A is None or self.samples_posterior_B is None:
+            raise RuntimeError(
+                "No posterior samples, in low memory mode they are released once"
+                " used. Call generate_posterior_samples() again first"
+            )
+
+    def plot_bayesian_probabilities(self, labels=["A", "B"], show=True):
         """
         Plots a horizontal bar chart of the likelihood of either variant being
-        the winner
+        the winner. The figure is returned and, unless show is False, written
+        to the app
         """
 
         fig, ax = plt.subplots(figsize=(10, 4), dpi=150)
@@ -154,21 +247,37 @@ class Bayesian(object):
         ax.tick_params(axis="both", which="both", bottom=False, left=False)
         fig.tight_layout()
 
-        st.write(fig)
+        if show:
+            st.write(fig)
 
-    def plot_simulation_of_difference(self):
+        return fig
+
+    def plot_simulation_of_difference(self, show=True):
         """
         Plots a histogram showing the distribution of the differences between
         A and B highlighting how much of the difference shows a positve diff
-        vs a negative one.
+        vs a negative one. The figure is returned and, unless show is False,
+        written to the app
         """
 
         fig, ax = plt.subplots(figsize=(10, 5), dpi=150)
 
-        difference = self.samples_posterior_B / self.samples_posterior_A - 1
+        if self.difference is None:
+            self.difference = self.calculate_difference()
+
+        # Sorting lets the positive and negative differences be taken as views
+        # rather than masked copies. Only in low memory mode, where the
+        # difference is released afterwards, is it sorted in place, otherwise
+        # it would no longer line up with the posterior samples
+        if self.low_memory:
+            difference = self.difference
+            difference.sort()
+        else:
+            difference = np.sort(self.difference)
 
-        greater = difference[difference > 0]
-        lower = difference[difference < 0]
+        greater = difference[np.searchsorted(difference, 0, side="right") :]
+        lower = difference[: np.searchsorted(difference, 0, side="left")]
+        n_samples = difference.size
 
         sns.histplot(greater, binwidth=0.01, color="#77C063")
 
@@ -180,7 +289,7 @@ class Bayesian(object):
             )
 
         ax.get_yaxis().set_major_formatter(
-            mtick.FuncFormatter(lambda x, p: format(x / len(difference), ".0%"))
+            mtick.FuncFormatter(lambda x, p: format(x / n_samples, ".0%"))
         )
 
         # Title
@@ -212,4 +321,10 @@ class Bayesian(object):
         ax.xaxis.set_major_formatter(mtick.PercentFormatter(1))
         fig.tight_layout()
 
-        st.write(fig)
+        if self.low_memory:
+            self.difference = None
+
+        if show:
+            st.write(fig)
+
+        return fig
@@ -0,0 +1,189 @@
+import numpy as np
+
+
+class CovariateStats(object):
+    """
+    A class used to accumulate the sufficient statistics of a metric and its
+    pre-experiment covariate for one variant in a single pass
+
+    ...
+
+    Visitors can be added in any number of chunks. Each chunk is reduced to
+    its count, means and centred sums of squares and cross-products, which
+    are then merged into the running totals. This avoids the loss of
+    precision of summing raw squares over millions of visitors. The same
+    statistics of a ratio's numerator (y) and denominator (x) per user are
+    what `ratio.RatioMetric` needs.
+
+    Attributes
+    ---------
+    n : int
+        The number of visitors added so far
+    mean_y, mean_x : float
+        The means of the metric and the covariate
+    m2_y, m2_x : float
+        The sums of squared deviations from the means
+    c_xy : float
+        The sum of the cross-products of the deviations
+
+    Methods
+    -------
+    from_sums
+        Creates an instance from pre-aggregated sums
+    update
+        Adds a chunk of visitors
+    merge
+        Adds the statistics accumulated by another instance
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean_y = 0.0
+        self.mean_x = 0.0
+        self.m2_y = 0.0
+        self.m2_x = 0.0
+        self.c_xy = 0.0
+
+    @classmethod
+    def from_sums(cls, n, sum_y, sum_x, sum_y2, sum_x2, sum_xy):
+        """Creates an instance from the sums, sums of squares and sum of
+        cross-products of y and x, e.g. from a pre-aggregated table.
+
+        Arrays are accepted to hold the statistics of many metrics at once,
+        in which case the instance cannot be updated or merged.
+        """
+
+        stats = cls()
+        stats.n = np.asarray(n)
+        stats.mean_y = np.divide(sum_y, n)
+        stats.mean_x = np.divide(sum_x, n)
+        stats.m2_y = sum_y2 - stats.mean_y * sum_y
+        stats.m2_x = sum_x2 - stats.mean_x * sum_x
+        stats.c_xy = sum_xy - stats.mean_x * sum_y
+
+        return stats
+
+    def update(self, y, x):
+        """Adds a chunk of visitors.
+
+        Parameters
+        ----------
+        y : array_like
+            The metric during the experiment, e.g. 1 for a conversion and 0
+            otherwise
+        x : array_like
+            The same visitors' pre-experiment covariate, e.g. their
+            conversions in the weeks before the test
+        """
+
+        y = np.asarray(y, dtype=float)
+        x = np.asarray(x, dtype=float)
+        if y.shape != x.shape:
+            raise ValueError("metric and covariate must have the same length")
+        if y.size == 0:
+            return self
+
+        chunk = CovariateStats()
+        chunk.n = y.size
+        chunk.mean_y = y.mean()
+        chunk.mean_x = x.mean()
+        dy = y - chunk.mean_y
+        dx = x - chunk.mean_x
+        chunk.m2_y = dy @ dy
+        chunk.m2_x = dx @ dx
+        chunk.c_xy = dx @ dy
+
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Adds the statistics accumulated by another instance."""
+
+        n = self.n + other.n
+        if n == 0:
+            return self
+
+        delta_y = other.mean_y - self.mean_y
+        delta_x = other.mean_x - self.mean_x
+        weight = self.n * other.n / n
+
+        self.m2_y += other.m2_y + delta_y ** 2 * weight
+        self.m2_x += other.m2_x + delta_x ** 2 * weight
+        self.c_xy += other.c_xy + delta_x * delta_y * weight
+        self.mean_y += delta_y * other.n / n
+        self.mean_x += delta_x * other.n / n
+        self.n = n
+
+        return self
+
+    @property
+    def sum_y(self):
+        return self.mean_y * self.n
+
+    @property
+    def var_y(self):
+        return self.m2_y / (self.n - 1)
+
+    @property
+    def var_x(self):
+        return self.m2_x / (self.n - 1)
+
+    @property
+    def cov_xy(self):
+        return self.c_xy / (self.n - 1)
+
+
+class Cuped(object):
+    """
+    A class used to represent a CUPED (Controlled-experiment Using
+    Pre-Experiment Data) adjustment of test data
+
+    ...
+
+    The metric of each variant is adjusted by theta times its covariate's
+    deviation from the overall covariate mean. Theta is the slope of the
+    metric on the covariate across both variants, which minimises the
+    variance of the adjusted metric.
+
+    Attributes
+    ---------
+    stats_A, stats_B : CovariateStats
+        The accumulated statistics for either variation
+    theta : float
+        The adjustment coefficient
+    control_mean, variant_mean : float
+        The adjusted means of the metric for A and B
+    control_var, variant_var : float
+        The adjusted variances of the metric for A and B
+    adjusted_difference : float
+        The difference between the adjusted means of B and A
+    variance_reduction : float
+        The proportion of the variance removed by the adjustment
+    """
+
+    def __init__(self, stats_A, stats_B):
+        self.stats_A = stats_A
+        self.stats_B = stats_B
+
+        pooled = CovariateStats().merge(stats_A).merge(stats_B)
+        self.theta = pooled.c_xy / pooled.m2_x if pooled.m2_x > 0 else 0.0
+
+        self.control_mean = stats_A.mean_y - self.theta * (
+            stats_A.mean_x - pooled.mean_x
+        )
+        self.variant_mean = stats_B.mean_y - self.theta * (
+            stats_B.mean_x - pooled.mean_x
+        )
+        self.control_var = self._adjusted_var(stats_A)
+        self.variant_var = self._adjusted_var(stats_B)
+        self.adjusted_difference = self.variant_mean - self.control_mean
+
+        raw_var = stats_A.var_y / stats_A.n + stats_B.var_y / stats_B.n
+        adjusted_var = self.control_var / stats_A.n + self.variant_var / stats_B.n
+        self.variance_reduction = 1 - adjusted_var / raw_var
+
+    def _adjusted_var(self, stats):
+        return (
+            stats.var_y
+            - 2 * self.theta * stats.cov_xy
+            + self.theta ** 2 * stats.var_x
+        )
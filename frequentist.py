@@ -24,11 +24,20 @@ class Frequentist(object):
     two_tails : bool (optional)
         Boolean defining whether it is a two-tail or one-tail test
         (default = True)
+    cuped : Cuped (optional)
+        CUPED adjustment based on a pre-experiment covariate. When given, the
+        adjusted difference and variances are used for the Z-test and power
+        (default = None)
     control_cr, variant_cr : float
         The conversion rates for A and B, labelled with A as the control and
         B as the variant
     relative_difference : float
         The percentage difference between A and B
+    observed_difference : float
+        The difference between the means of B and A tested by the Z-test,
+        CUPED adjusted if applicable
+    control_var, variant_var : float
+        The variances of the conversions, CUPED adjusted if applicable
     control_se, variant_se : float
         The standard error of the means
     se_difference : float
@@ -48,6 +57,7 @@ class Frequentist(object):
         conversions_B,
         alpha=0.05,
         two_tails=True,
+        cuped=None,
     ):
         self.visitors_A = visitors_A
         self.conversions_A = conversions_A
@@ -55,20 +65,44 @@ class Frequentist(object):
         self.conversions_B = conversions_B
         self.alpha = alpha
         self.two_tails = two_tails
+        self.cuped = cuped
         self.control_cr = conversions_A / visitors_A
         self.variant_cr = conversions_B / visitors_B
         self.relative_difference = self.variant_cr / self.control_cr - 1
-        self.control_se = (self.control_cr * (1 - self.control_cr) / visitors_A) ** 0.5
-        self.variant_se = (self.variant_cr * (1 - self.variant_cr) / visitors_B) ** 0.5
+        if cuped is None:
+            self.observed_difference = self.variant_cr - self.control_cr
+            self.control_var = self.control_cr * (1 - self.control_cr)
+            self.variant_var = self.variant_cr * (1 - self.variant_cr)
+        else:
+            self.observed_difference = cuped.adjusted_difference
+            self.control_var = cuped.control_var
+            self.variant_var = cuped.variant_var
+        self.control_se = (self.control_var / visitors_A) ** 0.5
+        self.variant_se = (self.variant_var / visitors_B) ** 0.5
         self.se_difference = (self.control_se ** 2 + self.variant_se ** 2) ** 0.5
         if two_tails is False:
-            if self.relative_difference < 0:
+            if self.observed_difference < 0:
                 self.tail_direction = "right"
             else:
                 self.tail_direction = "left"
         else:
             self.tail_direction = "two"
 
+    @classmethod
+    def from_cuped(cls, cuped, alpha=0.05, two_tails=True):
+        """Creates an instance from CUPED adjusted test data, taking the
+        visitors and conversions from the accumulated statistics."""
+
+        return cls(
+            cuped.stats_A.n,
+            round(cuped.stats_A.sum_y),
+            cuped.stats_B.n,
+            round(cuped.stats_B.sum_y),
+            alpha=alpha,
+            two_tails=two_tails,
+            cuped=cuped,
+        )
+
     def z_test(self):
         """Run a Z-test with your data, returning the Z-score and p-value.
 
@@ -80,27 +114,37 @@ class Frequentist(object):
         p_value : float
             Probability of obtaining test results at least as extreme as the
             observed results, under the conditions of the null hypothesis
+
+        The natural log of the p-value is also kept as log_p_value, which
+        stays accurate for extreme results where the p-value underflows to 0.
         """
 
-        combined_cr = (self.conversions_A + self.conversions_B) / (
-            self.visitors_A + self.visitors_B
-        )
-        self.combined_se = (
-            combined_cr
-            * (1 - combined_cr)
-            * (1 / self.visitors_A + 1 / self.visitors_B)
-        ) ** 0.5
+        if self.cuped is None:
+            combined_cr = (self.conversions_A + self.conversions_B) / (
+                self.visitors_A + self.visitors_B
+            )
+            self.combined_se = (
+                combined_cr
+                * (1 - combined_cr)
+                * (1 / self.visitors_A + 1 / self.visitors_B)
+            ) ** 0.5
+        else:
+            # The adjusted variances are not available pooled under the null
+            self.combined_se = self.se_difference
 
         # z-score
-        self.z_score = (self.variant_cr - self.control_cr) / self.combined_se
+        self.z_score = self.observed_difference / self.combined_se
 
         # Calculate the p-value dependent on one or two tails
         if self.tail_direction == "left":
             self.p_value = scs.norm.cdf(-self.z_score)
+            self.log_p_value = scs.norm.logcdf(-self.z_score)
         elif self.tail_direction == "right":
             self.p_value = scs.norm.cdf(self.z_score)
+            self.log_p_value = scs.norm.logcdf(self.z_score)
         else:
             self.p_value = 2 * scs.norm.cdf(-abs(self.z_score))
+            self.log_p_value = np.log(2) + scs.norm.logcdf(-abs(self.z_score))
 
         return self.z_score, self.p_value
 
@@ -114,12 +158,15 @@ class Frequentist(object):
         else:
             qu = scs.norm.ppf(1 - self.alpha)
 
-        diff = abs(self.variant_cr - self.control_cr)
-        avg_cr = (self.control_cr + self.variant_cr) / 2
+        diff = abs(self.observed_difference)
 
-        control_var = self.control_cr * (1 - self.control_cr)
-        variant_var = self.variant_cr * (1 - self.variant_cr)
-        avg_var = avg_cr * (1 - avg_cr)
+        control_var = self.control_var
+        variant_var = self.variant_var
+        if self.cuped is None:
+            avg_cr = (self.control_cr + self.variant_cr) / 2
+            avg_var = avg_cr * (1 - avg_cr)
+        else:
+            avg_var = (control_var + variant_var) / 2
 
         power_lower = scs.norm.cdf(
             (n ** 0.5 * diff - qu * (2 * avg_var) ** 0.5)
@@ -145,15 +192,16 @@ class Frequentist(object):
         self.z = z_dist.ppf(area)
         return self.z
 
-    def plot_test_visualisation(self):
-        """Plots a visualisation of the Z test and its results."""
+    def plot_test_visualisation(self, show=True):
+        """Plots a visualisation of the Z test and its results. The figure is
+        returned and, unless show is False, written to the app."""
 
         fig, ax = plt.subplots(figsize=(10, 5), dpi=150)
         xA = np.linspace(0 - 4 * self.se_difference, 0 + 4 * self.se_difference, 1000)
         yA = scs.norm(0, self.se_difference).pdf(xA)
         ax.plot(xA, yA, c="#181716")
 
-        diff = self.variant_cr - self.control_cr
+        diff = self.observed_difference
 
         ax.axvline(
             x=diff, ymax=ax.get_ylim()[1], c="tab:orange", alpha=0.5, linestyle="--"
@@ -220,11 +268,15 @@ class Frequentist(object):
         ax.get_yaxis().set_visible(False)
         fig.tight_layout()
 
-        st.write(fig)
+        if show:
+            st.write(fig)
 
-    def plot_power(self):
+        return fig
+
+    def plot_power(self, show=True):
         """Returns a streamlit plot figure visualising Power based on the
-        results of an AB test."""
+        results of an AB test. Set show to False to skip writing it to the
+        app."""
 
         fig, ax = plt.subplots(figsize=(10, 5), dpi=150)
 
@@ -380,4 +432,7 @@ class Frequentist(object):
         ax.get_yaxis().set_visible(False)
         fig.tight_layout()
 
-        st.write(fig)
+        if show:
+            st.write(fig)
+
+        return fig
@@ -1,4 +1,5 @@
 import streamlit as st
+import io
 import math
 import plotly.graph_objects as go
 
@@ -18,7 +19,31 @@ def round_decimals_down(number: float, decimals: int = 2):
     return math.floor(number * factor) / factor
 
 
-def create_plotly_table(data):
+def bayesian_table_data(b, prob_A, prob_B):
+    return {
+        "<b>Variant</b>": ["A", "B"],
+        "<b>Visitors</b>": [f"{b.visitors_A:,}", f"{b.visitors_B:,}"],
+        "<b>Conversions</b>": [b.conversions_A, b.conversions_B],
+        "<b>Conversion rate</b>": [f"{b.control_cr:.2%}", f"{b.variant_cr:.2%}"],
+        "<b>Uplift</b>": ["", f"{b.relative_difference:.2%}"],
+        "<b>Likelihood of being better</b>": [f"{prob_A:.2%}", f"{prob_B:.2%}"],
+    }
+
+
+def frequentist_table_data(f, z_score, p_value, power):
+    return {
+        "<b>Variant</b>": ["A", "B"],
+        "<b>Visitors</b>": [f"{f.visitors_A:,}", f"{f.visitors_B:,}"],
+        "<b>Conversions</b>": [f.conversions_A, f.conversions_B],
+        "<b>Conversion rate</b>": [f"{f.control_cr:.2%}", f"{f.variant_cr:.2%}"],
+        "<b>Uplift</b>": ["", f"{f.relative_difference:.2%}"],
+        "<b>Power</b>": ["", f"{power:.4f}"],
+        "<b>Z-score</b>": ["", f"{z_score:.4f}"],
+        "<b>P-value</b>": ["", f"{p_value:.4f}"],
+    }
+
+
+def create_plotly_table(data, show=True):
     fig = go.Figure(
         data=[
             go.Table(
@@ -49,7 +74,22 @@ def create_plotly_table(data):
         ),
     )
 
-    st.write(fig)
+    if show:
+        st.write(fig)
+
+    return fig
+
+
+def figure_to_png(fig):
+    """
+    Renders a Matplotlib figure to PNG bytes and closes it.
+    """
+    import matplotlib.pyplot as plt
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
 
 
 def local_css(file_name):
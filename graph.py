@@ -0,0 +1,49 @@
+import streamlit as st
+
+STATE_PREFIX = "stage:"
+
+
+def stage(name, fn, inputs, depends_on=()):
+    """Returns the result of a stage of the computation, recomputing it only
+    when its inputs change.
+
+    Results are held in the session state between reruns. Each stage is
+    keyed on its own inputs and on the versions of the stages it depends on,
+    so recomputing a stage also invalidates everything downstream of it,
+    while stages with unchanged inputs are reused even if the app switched
+    to a different view in between.
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the stage
+    fn : callable
+        Called as fn(*upstream_results, **inputs) when the stage is stale
+    inputs : dict
+        The plain values the stage depends on, compared with ==
+    depends_on : tuple of str (optional)
+        Names of the stages whose results are passed to fn, which must
+        already have run in this rerun (default = ())
+
+    Returns
+    -------
+    result
+        The return value of fn, fresh or from a previous rerun
+    """
+
+    upstream = [st.session_state[STATE_PREFIX + dep] for dep in depends_on]
+    signature = (inputs, tuple(dep["version"] for dep in upstream))
+
+    cached = st.session_state.get(STATE_PREFIX + name)
+    if cached is not None and cached["signature"] == signature:
+        return cached["result"]
+
+    result = fn(*[dep["result"] for dep in upstream], **inputs)
+
+    st.session_state[STATE_PREFIX + name] = {
+        "signature": signature,
+        "result": result,
+        "version": cached["version"] + 1 if cached is not None else 0,
+    }
+
+    return result
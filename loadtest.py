@@ -0,0 +1,409 @@
+"""
+Load-testing harness for sizing deployments of the Streamlit app.
+
+Drives many concurrent simulated sessions through `app.py` in this process
+with Streamlit's AppTest, each loading the app and then changing the inputs
+the way a user would. Reports the rerun latency, throughput and memory use
+over time, including the calculation workers started by `offload`. Run it
+from the repository directory, for example
+
+    python loadtest.py --users 20 --duration 300
+
+Sessions that enter an experiment ID save their results to a temporary
+database, so the app's result store is left untouched.
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Relative frequency of each interaction after a session has loaded the app
+ACTIONS = {
+    "edit_counts": 0.55,
+    "switch_method": 0.2,
+    "significance": 0.1,
+    "tails": 0.1,
+    "traffic_share": 0.05,
+}
+
+
+def _widget(at, kind, label):
+    return next(w for w in getattr(at.sidebar, kind) if w.label == label)
+
+
+def _edit_counts(at, rng):
+    # Data coming in: more visitors, or conversions as they are recorded
+    variant = rng.choice(["A", "B"])
+    visitors = _widget(at, "number_input", f"Visitors {variant}")
+    conversions = _widget(at, "number_input", f"Conversions {variant}")
+    if rng.random() < 0.5:
+        visitors.set_value(visitors.value + 100 * int(rng.integers(1, 20)))
+    else:
+        headroom = visitors.value - conversions.value
+        conversions.set_value(
+            conversions.value + min(10 * int(rng.integers(1, 10)), headroom)
+        )
+
+
+def _switch_method(at, rng):
+    method = _widget(at, "radio", "Bayesian vs. Frequentist")
+    method.set_value("Frequentist" if method.value == "Bayesian" else "Bayesian")
+
+
+def _significance(at, rng):
+    _widget(at, "slider", "Significance level").set_value(
+        float(rng.choice([0.8, 0.9, 0.95, 0.99]))
+    )
+
+
+def _tails(at, rng):
+    tails = _widget(at, "selectbox", "One vs. two tail")
+    tails.set_value("Two-tail" if tails.value == "One-tail" else "One-tail")
+
+
+def _traffic_share(at, rng):
+    _widget(at, "slider", "Intended share of traffic to B").set_value(
+        float(rng.choice([0.3, 0.4, 0.5, 0.6]))
+    )
+
+
+INTERACTIONS = {
+    "edit_counts": _edit_counts,
+    "switch_method": _switch_method,
+    "significance": _significance,
+    "tails": _tails,
+    "traffic_share": _traffic_share,
+}
+
+
+def memory_usage():
+    """Returns the resident set size in bytes of this process and of its
+    child processes, i.e. the calculation workers.
+
+    Reads /proc, so the workers are only counted on Linux. Elsewhere the
+    peak RSS of this process is returned instead of the current one.
+    """
+
+    try:
+        main = _proc_rss("self")
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, 0
+
+    workers = 0
+    parent = os.getpid()
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            if ppid == parent:
+                workers += _proc_rss(pid)
+        except (OSError, IndexError, ValueError):
+            continue
+
+    return main, workers
+
+
+def _proc_rss(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _shared_runtime():
+    """Returns patches that let AppTest sessions run concurrently.
+
+    AppTest installs a mock Runtime, which is global, at the start of every
+    run and removes it at the end, so one session finishing a rerun would
+    pull the Runtime from under the others. With the patches Streamlit falls
+    back to the last Runtime installed, much as all sessions of a server
+    share one Runtime.
+    """
+
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+        if not last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last[0]
+
+    def exists(cls):
+        return cls._instance is not None or bool(last)
+
+    return (
+        mock.patch.object(Runtime, "instance", classmethod(instance)),
+        mock.patch.object(Runtime, "exists", classmethod(exists)),
+    )
+
+
+def run_session(
+    user, session, interactions, think_time, experiment_share, timeout, rng, t0
+):
+    """Simulates one user session, returning a record of every rerun.
+
+    The session loads the app, optionally enters an experiment ID and then
+    makes `interactions` changes to the inputs drawn from ACTIONS, waiting an
+    exponentially distributed think time between reruns.
+    """
+
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    records = []
+
+    def rerun(action):
+        start = time.perf_counter()
+        try:
+            at.run()
+            error = bool(at.exception)
+        except RuntimeError:  # AppTest timed out
+            error = True
+        end = time.perf_counter()
+        records.append(
+            {
+                "action": action,
+                "finished": end - t0,
+                "latency": end - start,
+                "error": error,
+            }
+        )
+        return not error
+
+    # A session whose rerun failed has no widgets left to interact with
+    if not rerun("load"):
+        return records
+
+    if rng.random() < experiment_share:
+        _widget(at, "text_input", "Experiment ID (optional)").set_value(
+            f"loadtest-{user}-{session}"
+        )
+        if not rerun("experiment_id"):
+            return records
+
+    names = list(ACTIONS)
+    weights = np.array([ACTIONS[name] for name in names])
+    for _ in range(interactions):
+        if think_time:
+            time.sleep(rng.exponential(think_time))
+        action = rng.choice(names, p=weights / weights.sum())
+        INTERACTIONS[action](at, rng)
+        if not rerun(action):
+            break
+
+    return records
+
+
+def load_test(
+    users=10,
+    duration=60,
+    interactions=10,
+    think_time=1.0,
+    experiment_share=0.1,
+    timeout=60,
+    sample_interval=5,
+    seed=None,
+):
+    """Runs concurrent simulated sessions against the app for a fixed time.
+
+    Parameters
+    ----------
+    users : int (optional)
+        Number of concurrent users, each running one session after another
+        (default = 10)
+    duration : float (optional)
+        Seconds after which no new sessions are started. Sessions in
+        progress are finished (default = 60)
+    interactions : int (optional)
+        Changes to the inputs made in each session after loading the app
+        (default = 10)
+    think_time : float (optional)
+        Mean seconds a user waits between reruns, 0 to rerun straight away
+        (default = 1.0)
+    experiment_share : float (optional)
+        Share of sessions that enter an experiment ID and save their results,
+        to a temporary database (default = 0.1)
+    timeout : float (optional)
+        Seconds before a rerun is counted as an error (default = 60)
+    sample_interval : float (optional)
+        Seconds between samples of the memory use (default = 5)
+    seed : int (optional)
+        Seed for reproducible input mixes
+
+    Returns
+    -------
+    report : dict
+        The record of every rerun, the memory samples, the elapsed time and
+        the number of sessions
+    """
+
+    # Each rerun from a thread of this harness warns that it has no
+    # ScriptRunContext, which does not apply to AppTest
+    logging.getLogger(
+        "streamlit.runtime.scriptrunner_utils.script_run_context"
+    ).disabled = True
+    seeds = np.random.SeedSequence(seed).spawn(users)
+    store = tempfile.TemporaryDirectory()
+    patches = (
+        *_shared_runtime(),
+        mock.patch.dict(os.environ, RESULTS_DB=os.path.join(store.name, "results.db")),
+    )
+
+    memory = []
+    stop = threading.Event()
+
+    def sample_memory():
+        while True:
+            main, workers = memory_usage()
+            memory.append(
+                {"elapsed": time.perf_counter() - t0, "main": main, "workers": workers}
+            )
+            if stop.wait(sample_interval):
+                return
+
+    def user_loop(user):
+        rng = np.random.default_rng(seeds[user])
+        records = []
+        session = 0
+        while time.perf_counter() - t0 < duration:
+            records += run_session(
+                user,
+                session,
+                interactions,
+                think_time,
+                experiment_share,
+                timeout,
+                rng,
+                t0,
+            )
+            session += 1
+        return records, session
+
+    for patch in patches:
+        patch.start()
+    try:
+        # Import the app's modules and start the calculation workers once
+        # before the users arrive, as in a server that has been running
+        AppTest.from_file(APP_FILE, default_timeout=timeout).run()
+        t0 = time.perf_counter()
+
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+        try:
+            with ThreadPoolExecutor(max_workers=users) as pool:
+                results = list(pool.map(user_loop, range(users)))
+        finally:
+            stop.set()
+            sampler.join()
+    finally:
+        for patch in patches:
+            patch.stop()
+        store.cleanup()
+
+    main, workers = memory_usage()
+    memory.append(
+        {"elapsed": time.perf_counter() - t0, "main": main, "workers": workers}
+    )
+
+    return {
+        "records": [record for records, _ in results for record in records],
+        "sessions": sum(sessions for _, sessions in results),
+        "elapsed": time.perf_counter() - t0,
+        "memory": memory,
+    }
+
+
+def print_report(report, users):
+    records = report["records"]
+    elapsed = report["elapsed"]
+
+    print(f"Users: {users}  Sessions: {report['sessions']:,}  ", end="")
+    print(f"Reruns: {len(records):,}  Elapsed: {elapsed:.0f}s")
+    print(f"Throughput: {len(records) / elapsed:.2f} reruns/s")
+    print()
+    print(
+        f"{'Rerun':<16}{'Count':>8}{'Errors':>8}{'p50 (s)':>10}"
+        f"{'p99 (s)':>10}{'Max (s)':>10}"
+    )
+    for action in ["all", "load", "experiment_id", *ACTIONS]:
+        rows = [r for r in records if action in ("all", r["action"])]
+        if not rows:
+            continue
+        latency = np.array([r["latency"] for r in rows])
+        p50, p99 = np.percentile(latency, [50, 99])
+        print(
+            f"{action:<16}{len(rows):>8,}{sum(r['error'] for r in rows):>8,}"
+            f"{p50:>10.2f}{p99:>10.2f}{latency.max():>10.2f}"
+        )
+
+    print()
+    print("Memory (RSS) over time")
+    print(f"{'Elapsed (s)':<14}{'Reruns/s':>10}{'App (MB)':>10}{'Workers (MB)':>14}")
+    previous = 0.0
+    for sample in report["memory"]:
+        done = sum(previous < r["finished"] <= sample["elapsed"] for r in records)
+        interval = sample["elapsed"] - previous
+        rate = done / interval if interval > 0 else 0.0
+        print(
+            f"{sample['elapsed']:<14.0f}{rate:>10.2f}"
+            f"{sample['main'] / 2**20:>10.0f}{sample['workers'] / 2**20:>14.0f}"
+        )
+        previous = sample["elapsed"]
+
+    # Measure growth once every user has loaded the app and the calculation
+    # workers have started, so that only memory that keeps growing is counted
+    loads = sorted(r["finished"] for r in records if r["action"] == "load")
+    if not loads:
+        print("No session loaded the app, so there is no RSS growth to report")
+        return
+    warm = loads[min(users, len(loads)) - 1]
+    first = next(
+        (s for s in report["memory"] if s["elapsed"] >= warm), report["memory"][-1]
+    )
+    last = report["memory"][-1]
+    growth = last["main"] + last["workers"] - first["main"] - first["workers"]
+    print(f"RSS growth after {first['elapsed']:.0f}s: {growth / 2**20:+.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--interactions", type=int, default=10)
+    parser.add_argument("--think-time", type=float, default=1.0)
+    parser.add_argument("--experiment-share", type=float, default=0.1)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--sample-interval", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    report = load_test(
+        users=args.users,
+        duration=args.duration,
+        interactions=args.interactions,
+        think_time=args.think_time,
+        experiment_share=args.experiment_share,
+        timeout=args.timeout,
+        sample_interval=args.sample_interval,
+        seed=args.seed,
+    )
+    print_report(report, args.users)
+
+
+if __name__ == "__main__":
+    main()
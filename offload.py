@@ -0,0 +1,188 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import streamlit as st
+from bayesian import Bayesian
+from frequentist import Frequentist
+from fonts import apply_matplotlib_defaults
+from functions import figure_to_png
+
+# Shared by every session on the server, so keep it small enough that a burst
+# of reruns cannot starve the Streamlit server process itself
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# The workers are forked from the server process, which runs several threads.
+# A fork copies any lock held by another thread at that moment, e.g. in
+# logging or matplotlib, and a worker that needs such a lock hangs. get_pool
+# starts every worker at once to keep the forks to one point in time, but
+# cannot rule this out. A task that takes longer than TASK_TIMEOUT, hung or
+# not, is treated as a hung worker and the whole pool is replaced, failing
+# the tasks of other sessions that were running in it.
+TASK_TIMEOUT = 60
+POLL_INTERVAL = 0.2
+
+
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use("Agg")
+    apply_matplotlib_defaults()
+
+
+def _ready():
+    return True
+
+
+@st.cache_resource
+def get_pool():
+    """Returns the process pool shared by all sessions, with all of its
+    workers started."""
+    # Streamlit registers app.py as __main__, which multiprocessing re-runs in
+    # every worker started with spawn or forkserver, so the workers are forked
+    pool = ProcessPoolExecutor(
+        max_workers=MAX_WORKERS,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker,
+    )
+
+    # Fork every worker now, before any calculation runs, rather than as
+    # tasks arrive from the sessions' script threads. A fork that hangs would
+    # otherwise block every session waiting on the cache's lock
+    try:
+        for future in [pool.submit(_ready) for _ in range(MAX_WORKERS)]:
+            future.result(timeout=TASK_TIMEOUT)
+    except BaseException:
+        _terminate(pool)
+        raise
+
+    return pool
+
+
+def _terminate(pool):
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def _replace_pool(pool):
+    """Terminates a broken or hung pool, so that get_pool starts a new one."""
+
+    # Another session may already have replaced it
+    if get_pool() is pool:
+        get_pool.clear()
+    _terminate(pool)
+
+
+def run(fn, *args, timeout=TASK_TIMEOUT, **kwargs):
+    """Runs fn(*args, **kwargs) in the shared process pool and returns its
+    result.
+
+    The wait is split into short intervals so that Streamlit can interrupt it
+    when a rerun supersedes the current one, which cancels the task if it has
+    not started. A task that is already running cannot be stopped and is left
+    to finish, its result discarded. A task that times out is assumed to be
+    stuck on a hung worker, so the pool is replaced.
+
+    Parameters
+    ----------
+    fn : callable
+        A module level function, so that it can be pickled
+    timeout : float (optional)
+        Seconds to wait for the result before raising TimeoutError
+        (default = TASK_TIMEOUT)
+    """
+
+    pool = get_pool()
+    try:
+        future = pool.submit(fn, *args, **kwargs)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory), start again with a fresh pool
+        _replace_pool(pool)
+        pool = get_pool()
+        future = pool.submit(fn, *args, **kwargs)
+
+    placeholder = st.empty()
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                return future.result(timeout=POLL_INTERVAL)
+            except TimeoutError:
+                if time.monotonic() > deadline:
+                    _replace_pool(pool)
+                    raise
+            # Enqueuing an element is where Streamlit checks for a pending
+            # rerun or stop request
+            placeholder.empty()
+    finally:
+        future.cancel()
+
+
+def posterior_task(visitors_A, conversions_A, visitors_B, conversions_B):
+    """Samples the posteriors, returning the likelihoods of each variant being
+    better and the simulation of the difference rendered to PNG."""
+
+    b = Bayesian(visitors_A, conversions_A, visitors_B, conversions_B, low_memory=True)
+    b.generate_posterior_samples()
+    b.calculate_probabilities()
+
+    return {
+        "prob_A": b.prob_A,
+        "prob_B": b.prob_B,
+        "difference_figure": figure_to_png(b.plot_simulation_of_difference(show=False)),
+    }
+
+
+def probabilities_figure_task(
+    visitors_A, conversions_A, visitors_B, conversions_B, prob_A, prob_B
+):
+    """Renders the Bayesian probabilities figure to PNG."""
+
+    b = Bayesian(visitors_A, conversions_A, visitors_B, conversions_B)
+    b.prob_A = prob_A
+    b.prob_B = prob_B
+
+    return figure_to_png(b.plot_bayesian_probabilities(show=False))
+
+
+def test_figure_task(
+    visitors_A, conversions_A, visitors_B, conversions_B, alpha, two_tails
+):
+    """Renders the Z-test figure to PNG."""
+
+    f = _frequentist(
+        visitors_A, conversions_A, visitors_B, conversions_B, alpha, two_tails
+    )
+    return figure_to_png(f.plot_test_visualisation(show=False))
+
+
+def power_figure_task(
+    visitors_A, conversions_A, visitors_B, conversions_B, alpha, two_tails
+):
+    """Renders the power figure to PNG."""
+
+    f = _frequentist(
+        visitors_A, conversions_A, visitors_B, conversions_B, alpha, two_tails
+    )
+    return figure_to_png(f.plot_power(show=False))
+
+
+def _frequentist(
+    visitors_A, conversions_A, visitors_B, conversions_B, alpha, two_tails
+):
+    f = Frequentist(
+        visitors_A,
+        conversions_A,
+        visitors_B,
+        conversions_B,
+        alpha=alpha,
+        two_tails=two_tails,
+    )
+    f.z_test()
+    f.get_power()
+    f.get_z_value()
+    return f
@@ -0,0 +1,102 @@
+import numpy as np
+from scipy.special import ndtr, ndtri
+
+from batch import log_p_value
+
+
+class RatioMetric(object):
+    """
+    A class to represent test data for a ratio metric, such as clicks per
+    session or revenue per order, analysed with the delta method
+
+    ...
+
+    Visitors are randomised by user while the metric is a ratio of two sums
+    over their sessions or orders, so the Bernoulli variance used by
+    `Frequentist` does not apply. The delta method approximates the variance
+    of the ratio from the per-user sums of the numerator (y) and the
+    denominator (x), their squares and cross-products, so only aggregated
+    inputs are needed. Every statistic can be an array holding many metrics,
+    which are then evaluated together.
+
+    Attributes
+    ---------
+    stats_A, stats_B : CovariateStats
+        The per-user statistics of the numerator (y) and denominator (x) in
+        either variation, e.g. from `CovariateStats.from_sums`
+    alpha: float (optional)
+        Type I error probability (default = 0.05)
+    two_tails : bool (optional)
+        Boolean defining whether it is a two-tail or one-tail test
+        (default = True)
+    control_ratio, variant_ratio : float
+        The ratio metric for A and B
+    relative_difference : float
+        The percentage difference between A and B
+    control_se, variant_se : float
+        The delta method standard errors of the ratios
+    se_difference : float
+        The standard error of the difference of the ratios
+
+    Methods
+    -------
+    z_test
+        Runs a Z-test, returning the Z-score and p-value
+    get_power
+        Returns observed power from test results
+    """
+
+    def __init__(self, stats_A, stats_B, alpha=0.05, two_tails=True):
+        self.stats_A = stats_A
+        self.stats_B = stats_B
+        self.alpha = alpha
+        self.two_tails = two_tails
+        self.control_ratio = stats_A.mean_y / stats_A.mean_x
+        self.variant_ratio = stats_B.mean_y / stats_B.mean_x
+        self.relative_difference = self.variant_ratio / self.control_ratio - 1
+        self.control_se = self._delta_se(stats_A, self.control_ratio)
+        self.variant_se = self._delta_se(stats_B, self.variant_ratio)
+        self.se_difference = (self.control_se ** 2 + self.variant_se ** 2) ** 0.5
+
+    @staticmethod
+    def _delta_se(stats, ratio):
+        var = (
+            stats.var_y - 2 * ratio * stats.cov_xy + ratio ** 2 * stats.var_x
+        ) / stats.mean_x ** 2
+        return (var / stats.n) ** 0.5
+
+    def z_test(self):
+        """Run a Z-test on the difference of the ratios, returning the Z-score
+        and p-value.
+
+        One-tail tests take their direction from the sign of the observed
+        difference, as `Frequentist` does. The natural log of the p-value is
+        also kept as log_p_value.
+
+        Returns
+        -------
+        z_score : float
+            Number of standard errors between the ratios of A and B
+        p_value : float
+            Probability of obtaining test results at least as extreme as the
+            observed results, under the conditions of the null hypothesis
+        """
+
+        self.z_score = (self.variant_ratio - self.control_ratio) / self.se_difference
+        self.log_p_value = log_p_value(self.z_score, self.two_tails)
+        self.p_value = np.exp(self.log_p_value)
+
+        return self.z_score, self.p_value
+
+    def get_power(self):
+        """Returns observed power from test results."""
+
+        if self.two_tails:
+            qu = ndtri(1 - self.alpha / 2)
+        else:
+            qu = ndtri(1 - self.alpha)
+
+        effect = np.abs(self.variant_ratio - self.control_ratio) / self.se_difference
+        self.power = ndtr(effect - qu) + ndtr(-effect - qu)
+
+        return self.power
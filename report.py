@@ -0,0 +1,396 @@
+"""
+Exports self-contained HTML reports of the analysis of many experiments.
+
+Reads a CSV with the columns experiment_id, visitors_A, conversions_A,
+visitors_B and conversions_B, plus optionally alpha, two_tails,
+expected_share_B and group, and writes one report per experiment and an
+index page, for example
+
+    python report.py experiments.csv --output reports
+"""
+
+import argparse
+import base64
+import csv
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch import benjamini_hochberg
+from bayesian import Bayesian
+from fonts import apply_matplotlib_defaults
+from frequentist import Frequentist
+from functions import bayesian_table_data, create_plotly_table, frequentist_table_data
+from plotly.offline import get_plotlyjs
+from offload import (
+    posterior_task,
+    power_figure_task,
+    probabilities_figure_task,
+    test_figure_task,
+)
+from validation import describe_issues, validate
+
+STYLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
+
+# Set by _init_worker in each worker process
+_css = ""
+
+REPORT_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: "DejaVu Sans", sans-serif; max-width: 900px; margin: auto; }}
+img.figure {{ width: 100%; }}
+{css}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def _init_worker():
+    global _css
+
+    import matplotlib
+
+    matplotlib.use("Agg")
+    apply_matplotlib_defaults()
+
+    with open(STYLE_FILE) as f:
+        _css = f.read()
+
+
+def _figure_html(png):
+    data = base64.b64encode(png).decode("ascii")
+    return f"<img class='figure' src='data:image/png;base64,{data}'>"
+
+
+def _table_html(data, include_plotlyjs):
+    fig = create_plotly_table(data, show=False)
+    return fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs)
+
+
+def render_report(experiment, plotlyjs=True, issues=()):
+    """Renders the full analysis of one experiment to an HTML page.
+
+    Parameters
+    ----------
+    experiment : dict
+        The experiment_id, visitors and conversions for A and B, and
+        optionally alpha (default = 0.05) and two_tails (default = True)
+    plotlyjs : bool or str (optional)
+        How Plotly is included, passed to Figure.to_html. True embeds it so
+        the page is self-contained, "directory" loads plotly.min.js from the
+        same directory (default = True)
+    issues : list of str (optional)
+        Warnings about the test data shown at the top of the page, e.g. from
+        `describe_issues` on the checks of the whole batch (default = ())
+
+    Returns
+    -------
+    page : str
+        The HTML page, with Plotly and the figures embedded
+    summary : dict
+        The headline results for the index page
+    """
+
+    experiment_id = experiment["experiment_id"]
+    counts = (
+        experiment["visitors_A"],
+        experiment["conversions_A"],
+        experiment["visitors_B"],
+        experiment["conversions_B"],
+    )
+    alpha = experiment.get("alpha", 0.05)
+    two_tails = experiment.get("two_tails", True)
+
+    body = [f"<h1>{html.escape(str(experiment_id))}</h1>"]
+    for issue in issues:
+        body.append(f"<p><b>Warning:</b> {html.escape(issue)}</p>")
+
+    # Bayesian
+    b = Bayesian(*counts)
+    posterior = posterior_task(*counts)
+    prob_A = posterior["prob_A"]
+    prob_B = posterior["prob_B"]
+
+    body.append("<h2>Bayesian</h2>")
+    body.append(_figure_html(probabilities_figure_task(*counts, prob_A, prob_B)))
+    body.append(_table_html(bayesian_table_data(b, prob_A, prob_B), plotlyjs))
+    body.append(_figure_html(posterior["difference_figure"]))
+
+    # Frequentist
+    f = Frequentist(*counts, alpha=alpha, two_tails=two_tails)
+    z_score, p_value = f.z_test()
+    power = f.get_power()
+    significant = p_value < alpha
+
+    if f.relative_difference < 0:
+        direction = "<span class='lower'>{:.2%} lower</span>"
+    else:
+        direction = "<span class='higher'>{:.2%} higher</span>"
+
+    body.append("<h2>Frequentist</h2>")
+    if significant:
+        body.append("<h3>Significant</h3>")
+        body.append(
+            "<p>B's conversion rate is "
+            + direction.format(abs(f.relative_difference))
+            + f" than A's CR, with {1 - alpha:.0%} confidence.</p>"
+        )
+    else:
+        body.append("<h3>Not significant</h3>")
+        body.append(
+            "<p>There is not enough evidence to prove that there is a"
+            f" {f.relative_difference:.2%} difference in the conversion rates"
+            " between variants A and B.</p>"
+        )
+    body.append(_table_html(frequentist_table_data(f, z_score, p_value, power), False))
+    body.append(_figure_html(test_figure_task(*counts, alpha, two_tails)))
+    body.append(
+        f"<h3>Statistical power</h3><p>The power for your test is {power:.2%}</p>"
+    )
+    body.append(_figure_html(power_figure_task(*counts, alpha, two_tails)))
+
+    page = REPORT_TEMPLATE.format(
+        title=html.escape(f"AB test report: {experiment_id}"),
+        css=_css,
+        body="\n".join(body),
+    )
+    b.calculate_log_probabilities()
+    summary = {
+        "experiment_id": experiment_id,
+        "uplift": f.relative_difference,
+        "log_prob_A": b.log_prob_A,
+        "log_prob_B": b.log_prob_B,
+        "log_p_value": f.log_p_value,
+        "power": power,
+        "significant": significant,
+    }
+
+    return page, summary
+
+
+def _export_one(index, experiment, issues, output_dir, plotlyjs):
+    # A failure is returned rather than raised so that it does not abort the
+    # reports of the other experiments
+    try:
+        page, summary = render_report(experiment, plotlyjs, issues)
+        # The row index keeps ids that clean up to the same name, and
+        # duplicate ids, from overwriting each other's report
+        summary["file"] = f"{index}-{_file_name(experiment['experiment_id'])}.html"
+
+        with open(os.path.join(output_dir, summary["file"]), "w") as f:
+            f.write(page)
+    except Exception as e:
+        return {
+            "experiment_id": experiment["experiment_id"],
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+    return summary
+
+
+def export_reports(experiments, output_dir, workers=None, shared_plotlyjs=False):
+    """Writes a report for each experiment and an index page, in parallel.
+
+    Experiments with invalid test data, data the tests are undefined for, or
+    whose report failed are listed on the index page without a report.
+
+    Parameters
+    ----------
+    experiments : list of dict
+        The test data of each experiment, as for `render_report`, and
+        optionally expected_share_B, the intended share of visitors in B
+        (default = 0.5), and group, labelling the experiments whose conversion
+        rates are compared for outliers (default = all of them)
+    output_dir : str
+        Directory the reports are written to, created if needed
+    workers : int (optional)
+        Number of processes (default = number of CPUs)
+    shared_plotlyjs : bool (optional)
+        Write Plotly once to the output directory instead of embedding it in
+        every report, which saves several MB per report (default = False)
+
+    Returns
+    -------
+    summaries : list of dict
+        The headline results of the reports written, in the order of the
+        experiments
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    if shared_plotlyjs:
+        plotlyjs = "directory"
+        with open(os.path.join(output_dir, "plotly.min.js"), "w") as f:
+            f.write(get_plotlyjs())
+    else:
+        plotlyjs = True
+
+    checks = validate(
+        [e["visitors_A"] for e in experiments],
+        [e["conversions_A"] for e in experiments],
+        [e["visitors_B"] for e in experiments],
+        [e["conversions_B"] for e in experiments],
+        expected_share_B=[e.get("expected_share_B", 0.5) for e in experiments],
+        groups=(
+            [e.get("group", "") for e in experiments]
+            if any("group" in e for e in experiments)
+            else None
+        ),
+    )
+    unusable = checks["invalid"] | checks["degenerate"]
+    valid = [i for i, skip in enumerate(unusable) if not skip]
+    skipped = [
+        (experiments[i]["experiment_id"], describe_issues(checks, i)[0])
+        for i, skip in enumerate(unusable)
+        if skip
+    ]
+
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(), initializer=_init_worker
+    ) as pool:
+        results = list(
+            pool.map(
+                _export_one,
+                valid,
+                [experiments[i] for i in valid],
+                [describe_issues(checks, i) for i in valid],
+                [output_dir] * len(valid),
+                [plotlyjs] * len(valid),
+            )
+        )
+
+    summaries = [s for s in results if "error" not in s]
+    skipped += [
+        (s["experiment_id"], f"The report failed: {s['error']}")
+        for s in results
+        if "error" in s
+    ]
+
+    with open(os.path.join(output_dir, "index.html"), "w") as f:
+        f.write(_render_index(summaries, skipped))
+
+    return summaries
+
+
+def _render_index(summaries, skipped, fdr=0.05):
+    # Rank on the log p-values, which still order results whose p-values
+    # underflow to 0, and control the false discovery rate across them
+    log_p_values = np.array([s["log_p_value"] for s in summaries])
+    discoveries, log_q_values = benjamini_hochberg(log_p_values, fdr)
+
+    rows = []
+    for i in np.argsort(log_p_values, kind="stable"):
+        s = summaries[i]
+        rows.append(
+            "<tr>"
+            f"<td><a href='{html.escape(s['file'])}'>"
+            f"{html.escape(str(s['experiment_id']))}</a></td>"
+            f"<td>{s['uplift']:.2%}</td>"
+            f"<td>{_format_probability(s['log_prob_B'])}</td>"
+            f"<td>{_format_probability(s['log_prob_A'])}</td>"
+            f"<td>{_format_probability(s['log_p_value'])}</td>"
+            f"<td>{_format_probability(log_q_values[i])}</td>"
+            f"<td>{s['power']:.4f}</td>"
+            f"<td>{'Yes' if s['significant'] else 'No'}</td>"
+            f"<td>{'Yes' if discoveries[i] else 'No'}</td>"
+            "</tr>"
+        )
+
+    body = [
+        "<h1>AB test reports</h1>",
+        "<p>Ranked by p-value. Q-values and discoveries control the false"
+        f" discovery rate at {fdr:.0%} across all of the experiments.</p>",
+        "<table>",
+        "<tr><th>Experiment</th><th>Uplift</th><th>Likelihood B is better</th>"
+        "<th>Likelihood A is better</th><th>P-value</th><th>Q-value</th>"
+        "<th>Power</th><th>Significant</th><th>Discovery</th></tr>",
+        *rows,
+        "</table>",
+    ]
+    if skipped:
+        body.append("<h2>Skipped</h2><ul>")
+        for experiment_id, reason in skipped:
+            body.append(
+                f"<li>{html.escape(str(experiment_id))}: {html.escape(reason)}</li>"
+            )
+        body.append("</ul>")
+
+    return REPORT_TEMPLATE.format(title="AB test reports", css="", body="\n".join(body))
+
+
+def _format_probability(log_probability):
+    """Formats a probability from its natural log, in scientific notation
+    once it is too small to show to 4 decimal places."""
+
+    log10 = log_probability / np.log(10)
+    if log10 >= -4:
+        return f"{10 ** log10:.4f}"
+
+    exponent = int(np.floor(log10))
+    return f"{10 ** (log10 - exponent):.2f}e{exponent}"
+
+
+def _file_name(experiment_id):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(experiment_id))
+
+
+def read_experiments(path):
+    """Reads the test data of each experiment from a CSV file."""
+
+    experiments = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            experiment = {"experiment_id": row["experiment_id"]}
+            for column in [
+                "visitors_A",
+                "conversions_A",
+                "visitors_B",
+                "conversions_B",
+            ]:
+                experiment[column] = int(row[column])
+            if row.get("alpha"):
+                experiment["alpha"] = float(row["alpha"])
+            if row.get("two_tails"):
+                experiment["two_tails"] = row["two_tails"].lower() in ("true", "1")
+            if row.get("expected_share_B"):
+                experiment["expected_share_B"] = float(row["expected_share_B"])
+            if row.get("group"):
+                experiment["group"] = row["group"]
+            experiments.append(experiment)
+
+    return experiments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("experiments", help="CSV file of test data")
+    parser.add_argument("--output", default="reports")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--shared-plotlyjs",
+        action="store_true",
+        help="write Plotly once next to the reports instead of into each one",
+    )
+    args = parser.parse_args()
+
+    summaries = export_reports(
+        read_experiments(args.experiments),
+        args.output,
+        workers=args.workers,
+        shared_plotlyjs=args.shared_plotlyjs,
+    )
+    print(f"Wrote {len(summaries)} reports to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
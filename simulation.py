@@ -0,0 +1,279 @@
+"""
+Monte Carlo harness for checking the error rates of the tests in this app.
+
+Generates synthetic AB tests with known conversion rates, runs them through
+the vectorised statistical core in `batch` and reports the empirical type I
+error, power and calibration. Run it from the command line, for example
+
+    python simulation.py --experiments 1000000 --uplift 0.05 --looks 10
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import batch
+
+CALIBRATION_BINS = 10
+
+
+def simulate_chunk(
+    seed,
+    n_experiments,
+    control_cr,
+    relative_uplift,
+    visitors,
+    looks,
+    alpha,
+    two_tails,
+    threshold,
+    uplift_sd,
+):
+    """Simulates one chunk of experiments and returns summed counts.
+
+    Each experiment is split into `looks` equal increments of traffic, with
+    any remainder of the visitors added to the last, and tested after every
+    increment, so that peeking can be compared with a single test at the end.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    if uplift_sd:
+        uplift = rng.normal(relative_uplift, uplift_sd, size=(n_experiments, 1))
+        variant_cr = np.clip(control_cr * (1 + uplift), 0, 1)
+    else:
+        uplift = np.full((n_experiments, 1), relative_uplift)
+        variant_cr = control_cr * (1 + relative_uplift)
+
+    visitors_per_look = np.full(looks, visitors // looks)
+    visitors_per_look[-1] += visitors % looks
+    visitors_total = np.cumsum(visitors_per_look)
+
+    conversions_A = rng.binomial(visitors_per_look, control_cr, (n_experiments, looks))
+    conversions_B = rng.binomial(
+        visitors_per_look, np.broadcast_to(variant_cr, (n_experiments, looks))
+    )
+    np.cumsum(conversions_A, axis=1, out=conversions_A)
+    np.cumsum(conversions_B, axis=1, out=conversions_B)
+
+    _, p_value = batch.z_test(
+        visitors_total, conversions_A, visitors_total, conversions_B, two_tails
+    )
+    frequentist_win = p_value < alpha
+
+    prob_B = batch.prob_b_beats_a(
+        visitors_total, conversions_A, visitors_total, conversions_B
+    )
+    bayesian_win = (prob_B > threshold) | (prob_B < 1 - threshold)
+
+    predicted_power = batch.power(
+        visitors_total[-1],
+        conversions_A[:, -1],
+        visitors_total[-1],
+        conversions_B[:, -1],
+        alpha,
+        two_tails,
+    )
+
+    # Calibration of the final likelihood of B being better against whether
+    # B truly is better
+    bins = np.minimum(
+        (prob_B[:, -1] * CALIBRATION_BINS).astype(int), CALIBRATION_BINS - 1
+    )
+    b_better = uplift[:, 0] > 0
+
+    return {
+        "experiments": n_experiments,
+        "frequentist_final": frequentist_win[:, -1].sum(),
+        "frequentist_peeking": frequentist_win.any(axis=1).sum(),
+        "bayesian_final": bayesian_win[:, -1].sum(),
+        "bayesian_peeking": bayesian_win.any(axis=1).sum(),
+        "predicted_power": np.nansum(predicted_power),
+        # Power is undefined when the conversion rates are all 0 or 1
+        "power_experiments": np.count_nonzero(~np.isnan(predicted_power)),
+        "calibration_count": np.bincount(bins, minlength=CALIBRATION_BINS),
+        "calibration_b_better": np.bincount(
+            bins, weights=b_better, minlength=CALIBRATION_BINS
+        ),
+    }
+
+
+def simulate(
+    n_experiments,
+    control_cr,
+    relative_uplift=0.0,
+    visitors=10000,
+    looks=1,
+    alpha=0.05,
+    two_tails=True,
+    threshold=0.95,
+    uplift_sd=None,
+    chunk_size=100000,
+    workers=None,
+    seed=None,
+):
+    """Simulates AB tests in chunks across processes.
+
+    Parameters
+    ----------
+    n_experiments : int
+        Number of synthetic experiments
+    control_cr : float
+        True conversion rate of A
+    relative_uplift : float (optional)
+        True relative difference of B over A, 0 for an A/A test (default = 0)
+    visitors : int (optional)
+        Visitors per variant at the end of each experiment (default = 10000)
+    looks : int (optional)
+        Number of times each experiment is tested as the traffic comes in,
+        the last of them at the full sample size (default = 1)
+    alpha : float (optional)
+        Type I error probability of the Z-test (default = 0.05)
+    two_tails : bool (optional)
+        Two-tail or one-tail Z-test (default = True)
+    threshold : float (optional)
+        Likelihood of being better at which the Bayesian rule declares a
+        winner (default = 0.95)
+    uplift_sd : float (optional)
+        Spread of the true uplift across experiments, drawn from a normal
+        distribution around `relative_uplift`. Needed for a meaningful
+        calibration curve (default = None, every experiment has the same
+        uplift)
+    chunk_size : int (optional)
+        Experiments simulated at once by a worker (default = 100000)
+    workers : int (optional)
+        Number of processes (default = number of CPUs)
+    seed : int (optional)
+        Seed for reproducible results
+
+    Returns
+    -------
+    report : dict
+        Rates of declared winners at the final look and at any look, the
+        average predicted (observed) power and the calibration table
+    """
+
+    sizes = [chunk_size] * (n_experiments // chunk_size)
+    if n_experiments % chunk_size:
+        sizes.append(n_experiments % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    args = (control_cr, relative_uplift, visitors, looks, alpha, two_tails)
+    args += (threshold, uplift_sd)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        chunks = pool.map(
+            simulate_chunk,
+            seeds,
+            sizes,
+            *[[arg] * len(sizes) for arg in args],
+        )
+        totals = {}
+        for chunk in chunks:
+            for key, value in chunk.items():
+                totals[key] = totals.get(key, 0) + value
+
+    n = totals["experiments"]
+    with np.errstate(invalid="ignore"):
+        observed = totals["calibration_b_better"] / totals["calibration_count"]
+
+    return {
+        "experiments": n,
+        "frequentist_final": totals["frequentist_final"] / n,
+        "frequentist_peeking": totals["frequentist_peeking"] / n,
+        "bayesian_final": totals["bayesian_final"] / n,
+        "bayesian_peeking": totals["bayesian_peeking"] / n,
+        "predicted_power": totals["predicted_power"] / totals["power_experiments"],
+        "calibration": [
+            {
+                "likelihood_B_better": f"{i / CALIBRATION_BINS:.0%}-"
+                f"{(i + 1) / CALIBRATION_BINS:.0%}",
+                "experiments": int(count),
+                "B_better": rate,
+            }
+            for i, (count, rate) in enumerate(
+                zip(totals["calibration_count"], observed)
+            )
+        ],
+    }
+
+
+def print_report(report, relative_uplift, uplift_sd):
+    if uplift_sd:
+        label = "Winners declared"
+    elif relative_uplift == 0:
+        label = "Type I error"
+    else:
+        label = "Power"
+
+    print(f"Experiments simulated: {report['experiments']:,}")
+    print()
+    print(f"{label:<36}{'Final look':>12}{'Any look':>12}")
+    print(
+        f"{'Frequentist (p < alpha)':<36}"
+        f"{report['frequentist_final']:>12.2%}"
+        f"{report['frequentist_peeking']:>12.2%}"
+    )
+    print(
+        f"{'Bayesian (likelihood > threshold)':<36}"
+        f"{report['bayesian_final']:>12.2%}"
+        f"{report['bayesian_peeking']:>12.2%}"
+    )
+    print(
+        f"{'Average observed power (get_power)':<36}"
+        f"{report['predicted_power']:>12.2%}"
+    )
+
+    # Every experiment shares one true uplift without uplift_sd, so B is
+    # better in all of them or in none and the table would say nothing
+    if not uplift_sd:
+        return
+
+    print()
+    print("Calibration of the likelihood of B being better")
+    print(f"{'Likelihood':<12}{'Experiments':>14}{'B better':>12}")
+    for row in report["calibration"]:
+        print(
+            f"{row['likelihood_B_better']:<12}"
+            f"{row['experiments']:>14,}"
+            f"{row['B_better']:>12.2%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--experiments", type=int, default=1000000)
+    parser.add_argument("--control-cr", type=float, default=0.03)
+    parser.add_argument("--uplift", type=float, default=0.0)
+    parser.add_argument("--uplift-sd", type=float, default=None)
+    parser.add_argument("--visitors", type=int, default=50000)
+    parser.add_argument("--looks", type=int, default=1)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--one-tail", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.95)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    report = simulate(
+        args.experiments,
+        args.control_cr,
+        relative_uplift=args.uplift,
+        visitors=args.visitors,
+        looks=args.looks,
+        alpha=args.alpha,
+        two_tails=not args.one_tail,
+        threshold=args.threshold,
+        uplift_sd=args.uplift_sd,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        seed=args.seed,
+    )
+    print_report(report, args.uplift, args.uplift_sd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+INPUT_COLUMNS = (
+    "method",
+    "visitors_A",
+    "conversions_A",
+    "visitors_B",
+    "conversions_B",
+    "alpha",
+    "two_tails",
+)
+RESULT_COLUMNS = ("prob_A", "prob_B", "z_score", "p_value", "power")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    experiment_id TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    method TEXT NOT NULL,
+    visitors_A INTEGER NOT NULL,
+    conversions_A INTEGER NOT NULL,
+    visitors_B INTEGER NOT NULL,
+    conversions_B INTEGER NOT NULL,
+    alpha REAL,
+    two_tails INTEGER,
+    prob_A REAL,
+    prob_B REAL,
+    z_score REAL,
+    p_value REAL,
+    power REAL
+);
+CREATE INDEX IF NOT EXISTS results_experiment
+    ON results (experiment_id, method, recorded_at);
+"""
+
+
+class ResultStore(object):
+    """
+    A class used to persist computed test results in a local SQLite database
+
+    ...
+
+    Attributes
+    ---------
+    path : str
+        Location of the SQLite database file, created on first use
+
+    Methods
+    -------
+    record
+        Stores a snapshot of the results for an experiment, skipping it when
+        the inputs are unchanged from the latest snapshot
+    latest
+        Returns the most recent snapshot for an experiment
+    history
+        Returns every snapshot for an experiment in the order recorded
+    experiments
+        Returns the ids of all experiments in the store
+
+    """
+
+    def __init__(self, path="results.db"):
+        self.path = path
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # A connection per call keeps the store safe to share between the
+        # script threads of different Streamlit sessions
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, experiment_id, method, inputs, results, recorded_at=None):
+        """Stores a snapshot of the results for an experiment.
+
+        Parameters
+        ----------
+        experiment_id : str
+            Identifier the snapshot is filed under
+        method : str
+            Either "Bayesian" or "Frequentist"
+        inputs : dict
+            The visitors and conversions for A and B, plus alpha and two_tails
+            for Frequentist results
+        results : dict
+            Any of prob_A, prob_B, z_score, p_value and power
+        recorded_at : datetime (optional)
+            Time of the snapshot (default = now, in UTC)
+
+        Returns
+        -------
+        recorded : bool
+            False if the inputs match the latest snapshot for the experiment
+            and method, in which case nothing is written
+        """
+
+        row = dict.fromkeys(INPUT_COLUMNS + RESULT_COLUMNS)
+        row.update(inputs)
+        row.update(results)
+        row["method"] = method
+        if row["two_tails"] is not None:
+            row["two_tails"] = int(row["two_tails"])
+
+        latest = self.latest(experiment_id, method)
+        if latest is not None and all(
+            latest[column] == row[column] for column in INPUT_COLUMNS
+        ):
+            return False
+
+        if recorded_at is None:
+            recorded_at = datetime.now(timezone.utc)
+        row["experiment_id"] = experiment_id
+        row["recorded_at"] = recorded_at.isoformat()
+
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{column}" for column in row)
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO results ({columns}) VALUES ({placeholders})",
+                {column: _to_python(value) for column, value in row.items()},
+            )
+
+        return True
+
+    def latest(self, experiment_id, method=None):
+        """Returns the most recent snapshot for an experiment, or None."""
+
+        query = "SELECT * FROM results WHERE experiment_id = ?"
+        params = [experiment_id]
+        if method is not None:
+            query += " AND method = ?"
+            params.append(method)
+        query += " ORDER BY recorded_at DESC, id DESC LIMIT 1"
+
+        with self._connect() as conn:
+            row = conn.execute(query, params).fetchone()
+
+        return dict(row) if row is not None else None
+
+    def history(self, experiment_id, method=None):
+        """Returns every snapshot for an experiment, oldest first."""
+
+        query = "SELECT * FROM results WHERE experiment_id = ?"
+        params = [experiment_id]
+        if method is not None:
+            query += " AND method = ?"
+            params.append(method)
+        query += " ORDER BY recorded_at, id"
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def experiments(self):
+        """Returns the ids of all experiments in the store."""
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT experiment_id FROM results ORDER BY experiment_id"
+            ).fetchall()
+
+        return [row["experiment_id"] for row in rows]
+
+
+def _to_python(value):
+    """Converts NumPy scalars to the Python types SQLite can store."""
+    if hasattr(value, "item"):
+        return value.item()
+    return value
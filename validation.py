@@ -0,0 +1,165 @@
+import numpy as np
+import scipy.stats as scs
+
+SRM_ALPHA = 0.001
+OUTLIER_THRESHOLD = 3.5
+
+
+def validate(
+    visitors_A,
+    conversions_A,
+    visitors_B,
+    conversions_B,
+    expected_share_B=0.5,
+    groups=None,
+    srm_alpha=SRM_ALPHA,
+    outlier_threshold=OUTLIER_THRESHOLD,
+):
+    """Checks a batch of test data before it reaches the calculations.
+
+    Every argument can be a scalar or an array with one entry per test or
+    segment.
+
+    Parameters
+    ----------
+    visitors_A, conversions_A, visitors_B, conversions_B : array_like
+        The test data
+    expected_share_B : float or array_like (optional)
+        The intended share of visitors sent to B (default = 0.5)
+    groups : array_like (optional)
+        Labels grouping the rows that are compared with each other for the
+        outlier check, e.g. the experiment id of each segment (default = None,
+        all rows are compared)
+    srm_alpha : float (optional)
+        Significance level of the sample ratio mismatch test
+        (default = SRM_ALPHA)
+    outlier_threshold : float (optional)
+        Modified z-score of a conversion rate above which the row is flagged
+        as an outlier (default = OUTLIER_THRESHOLD)
+
+    Returns
+    -------
+    checks : dict
+        Boolean arrays flagging each row: "invalid" for impossible counts,
+        "degenerate" for counts the tests are undefined for, "srm" for a
+        sample ratio mismatch, "outlier" for conversion rates far from the
+        rest of their group and "valid" for rows safe to analyse.
+        Also "srm_p_value", and "share_B" and "expected_share_B", the
+        observed and intended shares of visitors in B
+    """
+
+    visitors_A, conversions_A, visitors_B, conversions_B = (
+        np.atleast_1d(np.asarray(x, dtype=float))
+        for x in (visitors_A, conversions_A, visitors_B, conversions_B)
+    )
+    expected_share_B = np.asarray(expected_share_B, dtype=float)
+
+    counts = (visitors_A, conversions_A, visitors_B, conversions_B)
+    invalid = np.zeros(visitors_A.shape, dtype=bool)
+    for x in counts:
+        invalid |= ~np.isfinite(x) | (x < 0) | (x != np.round(x))
+    invalid |= (visitors_A <= 0) | (visitors_B <= 0)
+    invalid |= (conversions_A > visitors_A) | (conversions_B > visitors_B)
+
+    # Possible counts that the calculations cannot handle: the relative
+    # difference divides by A's conversion rate, and the pooled standard
+    # error is 0 when every visitor converted
+    degenerate = ~invalid & (
+        (conversions_A == 0)
+        | (conversions_A + conversions_B == visitors_A + visitors_B)
+    )
+
+    # Chi-square goodness of fit of the visitors to the intended split
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total = visitors_A + visitors_B
+        expected_A = total * (1 - expected_share_B)
+        expected_B = total * expected_share_B
+        chi_square = (visitors_A - expected_A) ** 2 / expected_A + (
+            visitors_B - expected_B
+        ) ** 2 / expected_B
+        srm_p_value = np.where(invalid, np.nan, scs.chi2.sf(chi_square, df=1))
+        share_B = visitors_B / total
+    srm = srm_p_value < srm_alpha
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate_A = np.where(invalid, np.nan, conversions_A / visitors_A)
+        rate_B = np.where(invalid, np.nan, conversions_B / visitors_B)
+    outlier = _outliers(rate_A, groups, outlier_threshold) | _outliers(
+        rate_B, groups, outlier_threshold
+    )
+
+    return {
+        "invalid": invalid,
+        "degenerate": degenerate,
+        "srm": srm,
+        "outlier": outlier,
+        "valid": ~invalid & ~degenerate & ~srm,
+        "srm_p_value": srm_p_value,
+        "share_B": share_B,
+        "expected_share_B": np.broadcast_to(expected_share_B, share_B.shape),
+    }
+
+
+def describe_issues(checks, row=0):
+    """Returns a message for each problem flagged in a row of the checks."""
+
+    issues = []
+
+    if checks["invalid"][row]:
+        issues.append(
+            "The test data is not valid. Visitors must be positive whole"
+            " numbers and conversions cannot be negative or exceed the"
+            " visitors."
+        )
+        return issues
+
+    if checks["degenerate"][row]:
+        issues.append(
+            "The results cannot be calculated for this test data. A needs at"
+            " least one conversion, and the visitors cannot all have"
+            " converted in both variants."
+        )
+
+    if checks["srm"][row]:
+        issues.append(
+            f"Sample ratio mismatch: B received {checks['share_B'][row]:.2%}"
+            " of the visitors against an intended"
+            f" {checks['expected_share_B'][row]:.0%}"
+            f" (p = {checks['srm_p_value'][row]:.2g}). The split may be broken,"
+            " so the results could be biased."
+        )
+
+    if checks["outlier"][row]:
+        issues.append("The conversion rates are far from the other rows in the batch.")
+
+    return issues
+
+
+def _outliers(rates, groups, threshold):
+    """Flags rates with a modified z-score above the threshold in their group."""
+
+    outlier = np.zeros(rates.shape, dtype=bool)
+    if groups is None:
+        groups = np.zeros(rates.shape, dtype=int)
+    labels, inverse = np.unique(np.asarray(groups), return_inverse=True)
+
+    for label in range(labels.size):
+        in_group = inverse == label
+        group_rates = rates[in_group]
+        if np.count_nonzero(~np.isnan(group_rates)) < 3:
+            continue
+
+        median = np.nanmedian(group_rates)
+        deviation = np.abs(group_rates - median)
+        scale = np.nanmedian(deviation) / 0.6745
+        if scale == 0:
+            # Over half the rates are identical, fall back to the mean
+            # absolute deviation
+            scale = np.nanmean(deviation) * 1.2533
+        if scale == 0:
+            continue
+
+        with np.errstate(invalid="ignore"):
+            outlier[in_group] = deviation / scale > threshold
+
+    return outlier